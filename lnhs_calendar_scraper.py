@@ -6,17 +6,80 @@ and merges them into a single calendar.
 """
 
 import argparse
+import contextlib
+import heapq
+import json
 import logging
 import os
 import re
+import tempfile
 import time
 import traceback
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 
+import lxml.html
 import requests
-from bs4 import BeautifulSoup
-from icalendar import Calendar
+from lxml import etree
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+_EVENT_ID_RE = re.compile(r"/eventdetail/(\d+)/")
+_VEVENT_RE = re.compile(
+    rb"^BEGIN:VEVENT\r?$.*?^END:VEVENT(?=\r?$)", re.DOTALL | re.MULTILINE
+)
+_LINE_END_RE = re.compile(rb"\r?\n")
+# Identifying properties of an event, including any folded continuation lines
+_UID_RE = re.compile(rb"^UID:([^\r\n]*(?:\r?\n[ \t][^\r\n]*)*)", re.MULTILINE)
+_RECURRENCE_ID_RE = re.compile(
+    rb"^RECURRENCE-ID[;:][^\r\n]*(?:\r?\n[ \t][^\r\n]*)*", re.MULTILINE
+)
+_FOLD_RE = re.compile(rb"\r?\n[ \t]")
+
+_CALENDAR_HEADER = (
+    b"BEGIN:VCALENDAR\r\n"
+    b"VERSION:2.0\r\n"
+    b"PRODID:-//LNHS Calendar Scraper//EN\r\n"
+    b"CALSCALE:GREGORIAN\r\n"
+    b"METHOD:PUBLISH\r\n"
+)
+_CALENDAR_FOOTER = b"END:VCALENDAR\r\n"
+
+
+def _event_key(event):
+    """
+    Return the unfolded UID and RECURRENCE-ID identifying a VEVENT block, or
+    None if it has no UID.
+    """
+    uid = _UID_RE.search(event)
+    if not uid:
+        return None
+    recurrence_id = _RECURRENCE_ID_RE.search(event)
+    return (
+        _FOLD_RE.sub(b"", uid.group(1)),
+        _FOLD_RE.sub(b"", recurrence_id.group(0)) if recurrence_id else None,
+    )
+
+
+@contextlib.contextmanager
+def _atomic_writer(path):
+    """
+    Open a uniquely named temporary file beside path for binary writing, and
+    move it over path when the block completes. On error path is untouched.
+    """
+    temp_file = tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False
+    )
+    try:
+        with temp_file:
+            yield temp_file
+        # Temporary files are private, but the output may be served to others
+        os.chmod(temp_file.name, 0o644)
+        os.replace(temp_file.name, path)
+    except BaseException:
+        Path(temp_file.name).unlink(missing_ok=True)
+        raise
 
 
 class LNHSCalendarScraper:
@@ -24,13 +87,33 @@ class LNHSCalendarScraper:
     Scraper for LNHS calendar events.
     """
 
-    def __init__(self, cache_dir="cache", base_url="https://www.lnhs.org.uk"):
+    def __init__(
+        self, cache_dir="cache", base_url="https://www.lnhs.org.uk", max_workers=8
+    ):
         self.cache_dir = Path(cache_dir)
         self.base_url = base_url
+        self.max_workers = max_workers
         self.session = requests.Session()
         self.session.headers.update(
-            {"User-Agent": "Mozilla/5.0 (compatible; LNHS Calendar Scraper)"}
+            {
+                "User-Agent": "Mozilla/5.0 (compatible; LNHS Calendar Scraper)",
+                "Connection": "keep-alive",
+            }
+        )
+
+        # Reuse connections across the many same-host requests, with enough
+        # pooled connections for every download worker
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=max(16, max_workers),
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=[429, 500, 502, 503, 504],
+            ),
         )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
         # Ensure cache directory exists
         self.cache_dir.mkdir(exist_ok=True)
@@ -44,27 +127,57 @@ class LNHSCalendarScraper:
     def get_calendar_page(self, year, month, use_cache=True):
         """
         Download or retrieve cached calendar page for given year/month.
+        The page is returned as bytes, leaving lxml to work out its encoding.
         """
         cache_file = self.cache_dir / f"calendar_{year}_{month:02d}.html"
+        meta_file = self.cache_dir / f"calendar_{year}_{month:02d}.meta.json"
+        headers = {}
 
         if use_cache and cache_file.exists():
             # Check if cache is less than 1 hour old
             if time.time() - cache_file.stat().st_mtime < 3600:
                 self.logger.info("Using cached calendar for %s/%02d", year, month)
-                return cache_file.read_text(encoding="utf-8")
+                return cache_file.read_bytes()
+
+            # Otherwise revalidate it, so an unchanged page isn't re-sent
+            try:
+                meta = json.loads(meta_file.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                meta = None
+            if not isinstance(meta, dict):
+                # Missing or unreadable validators just mean a full download
+                meta = {}
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
 
         # Download calendar page
         url = f"{self.base_url}/index.php/activities/full-programme/monthcalendar/{year}/{month}/-"
         self.logger.info("Downloading calendar page: %s", url)
 
         try:
-            response = self.session.get(url, timeout=10)
+            response = self.session.get(url, headers=headers, timeout=10)
             response.raise_for_status()
 
-            # Cache the response
-            cache_file.write_text(response.text, encoding="utf-8")
-
-            return response.text
+            if response.status_code == 304:
+                self.logger.info("Calendar for %s/%02d unchanged", year, month)
+                cache_file.touch()
+                return cache_file.read_bytes()
+
+            # Cache the response, along with the validators for revalidation
+            cache_file.write_bytes(response.content)
+            with _atomic_writer(meta_file) as output:
+                output.write(
+                    json.dumps(
+                        {
+                            "etag": response.headers.get("ETag"),
+                            "last_modified": response.headers.get("Last-Modified"),
+                        }
+                    ).encode("utf-8")
+                )
+
+            return response.content
 
         except requests.RequestException as e:
             self.logger.error("Failed to download calendar page: %s", e)
@@ -77,32 +190,40 @@ class LNHSCalendarScraper:
         if not html_content:
             return []
 
-        soup = BeautifulSoup(html_content, "html.parser")
-        event_ids = []
-
-        # Look for event detail links
-        pattern = r"/eventdetail/(\d+)/"
-        links = soup.find_all("a", href=re.compile(pattern))
+        try:
+            document = lxml.html.fromstring(html_content)
+        except (etree.ParserError, ValueError):
+            # A blank page has no events, and lxml can't take text with an
+            # XML encoding declaration
+            return []
 
-        for link in links:
-            match = re.search(pattern, link.get("href"))
-            if match:
-                event_id = int(match.group(1))
-                if event_id not in event_ids:
-                    event_ids.append(event_id)
+        # Look for event detail links, letting XPath skip unrelated anchors so
+        # the regex only runs once on each candidate href
+        event_ids = {
+            int(match.group(1))
+            for href in document.xpath("//a[contains(@href, '/eventdetail/')]/@href")
+            if (match := _EVENT_ID_RE.search(href))
+        }
 
         self.logger.info("Found %d unique event IDs", len(event_ids))
         return sorted(event_ids)
 
-    def download_event_ical(self, event_id, use_cache=True):
+    def download_event_ical(self, event_id, use_cache=True, cached_files=None):
         """
         Download individual event iCal file.
+
+        cached_files optionally gives the names of files known to be in the
+        cache directory, saving a stat call per event.
         """
         cache_file = self.cache_dir / f"event_{event_id}.ics"
+        if cached_files is None:
+            is_cached = cache_file.exists()
+        else:
+            is_cached = cache_file.name in cached_files
 
-        if use_cache and cache_file.exists():
+        if use_cache and is_cached:
             self.logger.debug("Using cached iCal for event %d", event_id)
-            return cache_file.read_text(encoding="utf-8")
+            return cache_file.read_bytes()
 
         # Download iCal file
         url = f"{self.base_url}/index.php/activities/full-programme/icals.icalevent/-?tmpl=component&evid={event_id}"
@@ -112,78 +233,117 @@ class LNHSCalendarScraper:
             response = self.session.get(url, timeout=10)
             response.raise_for_status()
 
-            # Cache the response
-            cache_file.write_text(response.text, encoding="utf-8")
+            # Cache the raw bytes, via a uniquely named temporary file so an
+            # interrupted or concurrent run never leaves a truncated iCal in
+            # the cache
+            with _atomic_writer(cache_file) as output:
+                output.write(response.content)
 
-            return response.text
+            return response.content
 
         except requests.RequestException as e:
             self.logger.warning("Failed to download iCal for event %d: %s", event_id, e)
             return None
 
-    def merge_ical_files(self, ical_contents):
+    def merge_ical_files(self, ical_contents, output_path):
         """
-        Merge multiple iCal files into a single calendar.
-        """
-        master_calendar = Calendar()
-        master_calendar.add("prodid", "-//LNHS Calendar Scraper//EN")
-        master_calendar.add("version", "2.0")
-        master_calendar.add("calscale", "GREGORIAN")
-        master_calendar.add("method", "PUBLISH")
+        Merge multiple iCal files into a single calendar written to output_path.
 
+        VEVENT blocks are copied through verbatim rather than parsed and
+        re-serialised, so the merge is a single scan over the downloaded text.
+        """
         events_added = 0
-
-        for ical_content in ical_contents:
-            if not ical_content:
-                continue
-
-            try:
-                calendar = Calendar.from_ical(ical_content)
-
-                # Extract events from the calendar
-                for component in calendar.walk():
-                    if component.name == "VEVENT":
-                        master_calendar.add_component(component)
-                        events_added += 1
-
-            except (ValueError, TypeError) as e:
-                self.logger.error("Failed to parse iCal content: %s", e)
-                continue
+        seen_events = set()
+
+        # Events are merged while later downloads are still running, so build
+        # the calendar beside the output and only replace it once complete
+        with _atomic_writer(Path(output_path)) as output:
+            output.write(_CALENDAR_HEADER)
+
+            for ical_content in ical_contents:
+                if not ical_content:
+                    continue
+
+                events = _VEVENT_RE.findall(ical_content)
+                if not events:
+                    self.logger.error("No events found in iCal content")
+                    continue
+
+                # Skip events already merged from another download
+                new_events = []
+                for event in events:
+                    key = _event_key(event)
+                    if key is not None:
+                        if key in seen_events:
+                            continue
+                        seen_events.add(key)
+                    new_events.append(event)
+
+                # iCal requires CRLF line endings, whatever the source used
+                output.writelines(
+                    _LINE_END_RE.sub(b"\r\n", event) + b"\r\n" for event in new_events
+                )
+                events_added += len(new_events)
+
+            output.write(_CALENDAR_FOOTER)
 
         self.logger.info("Merged %d events into master calendar", events_added)
-        return master_calendar
+        return events_added
 
     def _get_event_ids_for_months(self, year, month_range, use_cache):
         """Helper method to get event IDs for specified months."""
         current_date = datetime.now()
         start_year = year or current_date.year
         start_month = current_date.month
-        all_event_ids = []
+        event_ids_by_month = []
 
         for month_offset in range(month_range):
-            target_date = datetime(start_year, start_month, 1) + timedelta(
-                days=32 * month_offset
-            )
-            target_year = target_date.year
-            target_month = target_date.month
+            months = start_month - 1 + month_offset
+            target_year = start_year + months // 12
+            target_month = months % 12 + 1
 
             self.logger.info("Scraping calendar for %s/%02d", target_year, target_month)
 
             html_content = self.get_calendar_page(target_year, target_month, use_cache)
-            event_ids = self.extract_event_ids(html_content)
-            all_event_ids.extend(event_ids)
+            event_ids_by_month.append(self.extract_event_ids(html_content))
+
+        # Each month's IDs are already sorted, so merge them and drop the
+        # duplicates from events spanning months as they come out adjacent
+        all_event_ids = []
+        for event_id in heapq.merge(*event_ids_by_month):
+            if not all_event_ids or all_event_ids[-1] != event_id:
+                all_event_ids.append(event_id)
 
-        return sorted(list(set(all_event_ids)))
+        return all_event_ids
 
     def _download_all_icals(self, event_ids, use_cache):
-        """Helper method to download all iCal files."""
-        ical_contents = []
-        for event_id in event_ids:
-            ical_content = self.download_event_ical(event_id, use_cache)
-            if ical_content:
-                ical_contents.append(ical_content)
-            time.sleep(0.5)  # Be respectful
-        return ical_contents
+        """
+        Helper method to download all iCal files concurrently.
+
+        Yields each iCal in order as soon as it is available, so the caller
+        can merge earlier events while later downloads are still running.
+        """
+        # List the cache once rather than checking for each event's file
+        cached_files = set()
+        if use_cache:
+            cached_files = {
+                entry.name
+                for entry in os.scandir(self.cache_dir)
+                if entry.name.startswith("event_")
+            }
+
+        # Downloads are independent, so overlap them; the worker count caps
+        # how many requests are in flight against the server at once.
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(
+                lambda event_id: self.download_event_ical(
+                    event_id, use_cache, cached_files
+                ),
+                event_ids,
+            )
+            for ical_content in results:
+                if ical_content:
+                    yield ical_content
 
     def scrape_calendar(
         self, year, month_range=2, output_file="lnhs_events.ics", use_cache=True
@@ -195,10 +355,9 @@ class LNHSCalendarScraper:
         self.logger.info("Total unique events to process: %d", len(all_event_ids))
 
         ical_contents = self._download_all_icals(all_event_ids, use_cache)
-        merged_calendar = self.merge_ical_files(ical_contents)
 
         output_path = Path(output_file)
-        output_path.write_bytes(merged_calendar.to_ical())
+        self.merge_ical_files(ical_contents, output_path)
         self.logger.info("Saved merged calendar to: %s", output_path)
 
         return str(output_path)
@@ -5,19 +5,244 @@ Uses the discovered API endpoint with polling for data.
 """
 
 import argparse
+import functools
 import os
 import re
+import sys
+import tempfile
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
 
+import lxml.html
 import requests
-from bs4 import BeautifulSoup
+from lxml import etree
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+# Date patterns for regex matching. Shared prefixes and suffixes are factored
+# out of the alternations, and possessive quantifiers stop the engine from
+# backtracking into digits or ordinal suffixes that can never match otherwise.
+_MONTH_NAMES = (
+    r"(?:(?:Jan|Febr)uary|Ma(?:rch|y)|A(?:pril|ugust)|Ju(?:ne|ly)"
+    r"|(?:Septem|Octo|Novem|Decem)ber)"
+)
+_WEEKDAY_DATE = (
+    r"\b(?:Mon|Tues|Wednes|Thurs|Fri|Satur|Sun)day,?"
+    r"\s+\d{1,2}+(?:st|nd|rd|th)?+\s+" + _MONTH_NAMES + r"(?:\s+\d{4})?\b"
+)
+_FULL_DATE = r"\b\d{1,2}+(?:st|nd|rd|th)?+\s+" + _MONTH_NAMES + r"\s+\d{4}\b"
+# Both forms in one pass; the weekday form is tried first so it wins where
+# a full date is part of a longer weekday date
+_DATE_RE = re.compile(f"{_WEEKDAY_DATE}|{_FULL_DATE}", re.IGNORECASE)
+
+_ORDINAL_RE = re.compile(r"(\d++)(?:st|nd|rd|th)")
+_YEAR_RE = re.compile(r"\d{4}")
+
+# Month numbers by lower-cased full name, for parsing dates without strptime
+_MONTHS = {
+    name: number
+    for number, name in enumerate(
+        (
+            "january",
+            "february",
+            "march",
+            "april",
+            "may",
+            "june",
+            "july",
+            "august",
+            "september",
+            "october",
+            "november",
+            "december",
+        ),
+        start=1,
+    )
+}
+
+# Words dropped from service names in event titles. Renewals keep "waste",
+# so "Garden waste" renews as "Garden waste Renewal".
+_SERVICE_NOISE_RE = re.compile(r"collection|waste|\(blue sacks\)")
+_RENEWAL_NOISE_RE = re.compile(r"collection|\(blue sacks\)")
+
+# Successfully fetched pages are cached here, as bin days change infrequently
+_CACHE_DIR = Path.home() / ".cache" / "brent_waste"
+_DEFAULT_CACHE_TTL = 6 * 3600
+
+# Compiled XPath queries for the structured collection details
+_WASTE_SECTIONS_XPATH = etree.XPath(
+    "//h3[contains(concat(' ', normalize-space(@class), ' '),"
+    " ' waste-service-name ')]"
+)
+_SERVICE_DETAILS_XPATH = etree.XPath(
+    "following-sibling::div[contains(concat(' ', normalize-space(@class), ' '),"
+    " ' govuk-grid-row ')][1]"
+)
+_SUMMARY_VALUE_XPATH = etree.XPath(
+    "(.//dt[normalize-space() = $label])[1]/following::dd[1]"
+)
+
+# Each calendar event, filled in by generate_ical
+_VEVENT_TEMPLATE = (
+    "BEGIN:VEVENT\n"
+    "UID:{uid}\n"
+    "{dtstart}\n"
+    "SUMMARY:{summary}\n"
+    "DESCRIPTION:{description}\n"
+    "CATEGORIES:Waste Collection\n"
+    "DTSTAMP:{dtstamp}\n"
+    "END:VEVENT"
+)
+
+# Summary list rows to extract, with the suffix added to the service name
+_SUMMARY_ROWS = (
+    ("Next collection", ""),
+    # Also look for "Last collection" for completeness
+    ("Last collection", " (last)"),
+    # Look for "Renewal" date (typically for garden waste)
+    ("Renewal", " (renewal)"),
+)
+
+
+def create_session():
+    """
+    Create a session with pooled keep-alive connections, compressed
+    responses and retries.
+    """
+    session = requests.Session()
+    session.headers.update(
+        {
+            "Connection": "keep-alive",
+            # The collection page is re-polled while it loads, so always ask
+            # for it compressed
+            "Accept-Encoding": "gzip, deflate",
+        }
+    )
+
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+        ),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
+
+
+@functools.cache
+def _get_session():
+    """
+    Return the module-wide session, creating it on first use.
+    """
+    return create_session()
+
+
+def _cache_path(property_id):
+    """
+    Return the path of the cached collection page for a property.
+    """
+    return _CACHE_DIR / f"{property_id}.html"
+
+
+def _write_cache(property_id, content):
+    """
+    Atomically cache the raw bytes of a successfully fetched collection page.
+    """
+    cache_file = _cache_path(property_id)
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # Each write gets its own temporary file, so overlapping runs can't
+        # interleave; it is deleted on exit unless it was moved into place
+        with tempfile.NamedTemporaryFile(
+            dir=cache_file.parent,
+            prefix=f".{cache_file.name}.",
+            suffix=".tmp",
+            delete_on_close=False,
+        ) as temp_file:
+            temp_file.write(content)
+            temp_file.close()
+            os.replace(temp_file.name, cache_file)
+    except OSError as e:
+        print(f"  Could not cache collection data: {e}")
+
+
+def _poll_delay(attempt):
+    """
+    Return the seconds to wait after a poll attempt. The wait grows
+    exponentially from 1.5s but is capped, so polling a page stuck loading
+    takes about as long overall as the original fixed 3s waits.
+    """
+    return min(1.5 * 2**attempt, 4)
+
+
+def _parse_page(content):
+    """
+    Parse a collection page, returning None if it can't be parsed at all,
+    such as when it is blank.
+    """
+    try:
+        return lxml.html.fromstring(content)
+    except (etree.ParserError, ValueError):
+        # lxml raises ValueError for text with an XML encoding declaration
+        return None
 
 
-def get_collection_data(property_id, max_attempts=10, cache_html=False):
+def _save_attempt_html(property_id, attempt, content):
+    """
+    Write the HTML fetched by a poll attempt to a file for analysis.
+    """
+    filename = f"brent_waste_{property_id}_attempt_{attempt + 1}.html"
+    with open(filename, "wb") as f:
+        f.write(content)
+    print(f"  Property {property_id}: Saved HTML to {filename}")
+
+
+def _read_cache(property_id, cache_ttl):
+    """
+    Return the collection data from the cached page for a property, or None
+    if there is no cached page less than cache_ttl seconds old.
+    """
+    cache_file = _cache_path(property_id)
+    try:
+        if time.time() - cache_file.stat().st_mtime >= cache_ttl:
+            return None
+        content = cache_file.read_bytes()
+    except FileNotFoundError:
+        return None
+
+    print(f"Using cached collection data from {cache_file}")
+    document = _parse_page(content)
+    if document is None:
+        return None
+    return extract_collection_dates(document) or None
+
+
+def get_collection_data(
+    property_id,
+    max_attempts=10,
+    cache_html=False,
+    *,
+    session=None,
+    cache_ttl=_DEFAULT_CACHE_TTL,
+):
     """
     Poll the Brent Council API endpoint until data loads.
+    Returns cached data instead if it is less than cache_ttl seconds old;
+    a cache_ttl of 0 always fetches afresh.
     """
+    collection_data = _read_cache(property_id, cache_ttl)
+    if collection_data:
+        return collection_data
+
     url = f"https://recyclingservices.brent.gov.uk/waste/{property_id}"
 
     headers = {
@@ -25,151 +250,178 @@ def get_collection_data(property_id, max_attempts=10, cache_html=False):
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
     }
 
-    session = requests.Session()
+    if session is None:
+        session = _get_session()
 
     for attempt in range(max_attempts):
         try:
-            print(f"Attempt {attempt + 1}/{max_attempts}: Fetching collection data...")
+            print(
+                f"Attempt {attempt + 1}/{max_attempts}: Fetching collection data"
+                f" for property {property_id}..."
+            )
 
             # Try with page_loading parameter
             response = session.get(f"{url}?page_loading=1", headers=headers, timeout=10)
 
             if response.status_code == 200:
-                content = response.text
+                raw_content = response.content
 
                 # Write HTML to file for analysis if caching enabled
                 if cache_html:
-                    filename = f"brent_waste_{property_id}_attempt_{attempt + 1}.html"
-                    with open(filename, "w", encoding="utf-8") as f:
-                        f.write(content)
-                    print(f"  Saved HTML to {filename}")
-
-                # Check if still loading
-                if "Loading your bin days..." in content:
-                    print("  Still loading, waiting 3 seconds...")
-                    time.sleep(3)
+                    _save_attempt_html(property_id, attempt, raw_content)
+
+                # Check if still loading, backing off exponentially as the
+                # page usually loads within the first couple of polls. This
+                # works on the raw bytes so loading pages are never decoded.
+                if b"Loading your bin days..." in raw_content:
+                    if attempt + 1 < max_attempts:
+                        wait = _poll_delay(attempt)
+                        print(
+                            f"  Property {property_id}: Still loading,"
+                            f" waiting {wait:.1f} seconds..."
+                        )
+                        time.sleep(wait)
                     continue
 
-                # Parse the HTML content
-                soup = BeautifulSoup(content, "html.parser")
+                # Parse the HTML content, leaving lxml to work out its
+                # encoding from the document
+                document = _parse_page(raw_content)
 
-                # Look for collection information
-                collection_data = extract_collection_dates(soup)
+                # Look for collection information, treating a blank page as
+                # having none
+                collection_data = None
+                if document is not None:
+                    collection_data = extract_collection_dates(document)
 
                 if collection_data:
+                    _write_cache(property_id, raw_content)
                     return collection_data
-                print("  No collection data found in response")
+                print(f"  Property {property_id}: No collection data found in response")
 
             else:
-                print(f"  HTTP {response.status_code}: {response.reason}")
+                print(
+                    f"  Property {property_id}: HTTP {response.status_code}:"
+                    f" {response.reason}"
+                )
 
         except requests.exceptions.RequestException as e:
-            print(f"  Request error: {e}")
+            print(f"  Property {property_id}: Request error: {e}")
 
-        time.sleep(2)  # Wait before next attempt
+        # Back off before the next attempt, without waiting after the last one
+        if attempt + 1 < max_attempts:
+            time.sleep(_poll_delay(attempt))
 
     return None
 
 
-def _extract_dates_with_regex(soup):
+def get_many(property_ids, max_workers=10, **kwargs):
     """
-    Extract dates using regex patterns as fallback.
+    Fetch collection data for several properties concurrently.
+    Returns a dict mapping each property ID to its collection data (or None).
+    Other keyword arguments are passed on to get_collection_data.
     """
-    # Date patterns for regex matching
-    weekday_pattern = (
-        r"\b(?:Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday),?"
-        r"\s+\d{1,2}(?:st|nd|rd|th)?\s+"
-        r"(?:January|February|March|April|May|June|July|August|September|October|November|December)"
-        r"(?:\s+\d{4})?\b"
-    )
-    date_only_pattern = (
-        r"\b\d{1,2}(?:st|nd|rd|th)?\s+"
-        r"(?:January|February|March|April|May|June|July|August|September|October|November|December)"
-        r"\s+\d{4}\b"
-    )
-    date_patterns = [weekday_pattern, date_only_pattern]
 
-    text_content = soup.get_text()
-    found_dates = set()
+    def lookup(property_id):
+        # One property failing shouldn't lose every other property's results
+        try:
+            return get_collection_data(property_id, **kwargs)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f"  Property {property_id}: Lookup failed: {e}")
+            return None
 
-    for pattern in date_patterns:
-        matches = re.findall(pattern, text_content, re.IGNORECASE)
-        found_dates.update(matches)
+    # Each lookup spends most of its time polling, so overlap them
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(property_ids)))
+    ) as executor:
+        return dict(zip(property_ids, executor.map(lookup, property_ids)))
 
-    return sorted(list(found_dates)) if found_dates else []
 
+def _extract_dates_with_regex(text_content):
+    """
+    Extract dates from the page text using regex patterns as fallback.
+    """
+    return sorted(set(_DATE_RE.findall(text_content)))
 
-def extract_collection_dates(soup):
+
+def extract_collection_dates(document):
     """
-    Extract collection dates from the parsed HTML.
+    Extract collection dates from the parsed HTML document.
     """
     collections = []
 
     # Find all waste service sections
-    waste_sections = soup.find_all("h3", class_="govuk-heading-m waste-service-name")
-
-    for section in waste_sections:
-        service_name = section.get_text().strip()
-
-        # Find the next collection date for this service
-        next_section = section.find_next_sibling("div", class_="govuk-grid-row")
-        if next_section:
-            # Look for "Next collection" row
-            next_collection_row = next_section.find("dt", string="Next collection")
-            if next_collection_row:
-                next_collection_value = next_collection_row.find_next("dd")
-                if next_collection_value:
-                    date_text = next_collection_value.get_text().strip()
-                    if date_text:
-                        collections.append(f"{service_name}: {date_text}")
-
-            # Also look for "Last collection" for completeness
-            last_collection_row = next_section.find("dt", string="Last collection")
-            if last_collection_row:
-                last_collection_value = last_collection_row.find_next("dd")
-                if last_collection_value:
-                    date_text = last_collection_value.get_text().strip()
-                    if date_text:
-                        collections.append(f"{service_name} (last): {date_text}")
-
-            # Look for "Renewal" date (typically for garden waste)
-            renewal_row = next_section.find("dt", string="Renewal")
-            if renewal_row:
-                renewal_value = renewal_row.find_next("dd")
-                if renewal_value:
-                    date_text = renewal_value.get_text().strip()
-                    if date_text:
-                        collections.append(f"{service_name} (renewal): {date_text}")
+    for section in _WASTE_SECTIONS_XPATH(document):
+        service_name = section.text_content().strip()
+
+        # Find the collection details for this service
+        details = _SERVICE_DETAILS_XPATH(section)
+        if not details:
+            continue
+
+        for label, suffix in _SUMMARY_ROWS:
+            values = _SUMMARY_VALUE_XPATH(details[0], label=label)
+            if values:
+                date_text = values[0].text_content().strip()
+                if date_text:
+                    collections.append(f"{service_name}{suffix}: {date_text}")
 
     # If no structured data found, fall back to regex pattern matching
     if not collections:
-        collections = _extract_dates_with_regex(soup)
+        collections = _extract_dates_with_regex(document.text_content())
 
     return collections
 
 
-def parse_collection_date(date_text):
+def _strip_adjustment_note(text):
+    """
+    Remove a trailing "(this collection was adjusted ...)" note, if present.
+    """
+    index = text.find("(this collection was adjusted")
+    return text[:index].strip() if index >= 0 else text
+
+
+def _parse_day_month_year(date_text):
+    """
+    Parse a "15 July 2024" date, only falling back to strptime for text
+    that isn't a plain day, month name and year.
+    """
+    parts = date_text.split()
+    if len(parts) == 3:
+        day, month, year = parts
+        if (
+            len(day) <= 2
+            and day.isascii()
+            and day.isdigit()
+            and len(year) == 4
+            and year.isascii()
+            and year.isdigit()
+            and (month_number := _MONTHS.get(month.lower()))
+        ):
+            return datetime(int(year), month_number, int(day))
+    return datetime.strptime(date_text, "%d %B %Y")
+
+
+def parse_collection_date(date_text, current_year=None):
     """
     Parse collection date text and return a datetime object with time if available.
+    Dates without a year are taken to be in current_year (default: this year).
     """
+    if current_year is None:
+        current_year = datetime.now().year
+
     # Clean up the date text
     date_text = date_text.strip()
 
     # Extract time information if present
     time_part = None
-    if " at " in date_text:
-        parts = date_text.split(" at ")
-        date_text = parts[0]
-        if len(parts) > 1:
-            time_info = parts[1].strip()
-            # Remove adjustment notes from time part
-            if "(this collection was adjusted" in time_info:
-                time_info = time_info.split("(this collection was adjusted")[0].strip()
-            time_part = time_info
+    head, sep, tail = date_text.partition(" at ")
+    if sep:
+        # Remove adjustment notes from time part
+        time_part = _strip_adjustment_note(tail.strip())
+        date_text = head
 
     # Remove adjustment notes from date part
-    if "(this collection was adjusted" in date_text:
-        date_text = date_text.split("(this collection was adjusted")[0].strip()
+    date_text = _strip_adjustment_note(date_text)
 
     # Remove trailing comma
     date_text = date_text.rstrip(",")
@@ -177,37 +429,36 @@ def parse_collection_date(date_text):
     # Parse different date formats
     try:
         # Try "Tuesday, 15th July" format
-        if "," in date_text:
-            parts = date_text.split(", ")
-            if len(parts) >= 2:
-                date_part = parts[1].strip()
-                # Handle ordinal numbers (15th -> 15)
-                date_part = re.sub(r"(\d+)(?:st|nd|rd|th)", r"\1", date_part)
-
-                # Add current year if not present
-                if not re.search(r"\d{4}", date_part):
-                    current_year = datetime.now().year
-                    date_part = f"{date_part} {current_year}"
-
-                # Parse the date
-                date_obj = datetime.strptime(date_part, "%d %B %Y")
-
-                # Add time if available
-                if time_part:
-                    time_obj = parse_time(time_part)
-                    if time_obj:
-                        date_obj = date_obj.replace(
-                            hour=time_obj.hour, minute=time_obj.minute
-                        )
+        _, sep, tail = date_text.partition(", ")
+        if sep:
+            # Only the text up to any further comma is the date
+            date_part = tail.partition(", ")[0].strip()
+            # Handle ordinal numbers (15th -> 15)
+            date_part = _ORDINAL_RE.sub(r"\1", date_part)
+
+            # Add current year if not present
+            if not _YEAR_RE.search(date_part):
+                date_part = f"{date_part} {current_year}"
+
+            # Parse the date
+            date_obj = _parse_day_month_year(date_part)
 
-                return date_obj
+            # Add time if available
+            if time_part:
+                time_obj = parse_time(time_part)
+                if time_obj:
+                    date_obj = date_obj.replace(
+                        hour=time_obj.hour, minute=time_obj.minute
+                    )
+
+            return date_obj
 
         # Try other formats
-        date_text = re.sub(r"(\d+)(?:st|nd|rd|th)", r"\1", date_text)
+        date_text = _ORDINAL_RE.sub(r"\1", date_text)
 
         # Try "15 July 2024" format
         try:
-            date_obj = datetime.strptime(date_text, "%d %B %Y")
+            date_obj = _parse_day_month_year(date_text)
             if time_part:
                 time_obj = parse_time(time_part)
                 if time_obj:
@@ -220,8 +471,7 @@ def parse_collection_date(date_text):
 
         # Try "15 July" format (add current year)
         try:
-            current_year = datetime.now().year
-            date_obj = datetime.strptime(f"{date_text} {current_year}", "%d %B %Y")
+            date_obj = _parse_day_month_year(f"{date_text} {current_year}")
             if time_part:
                 time_obj = parse_time(time_part)
                 if time_obj:
@@ -266,6 +516,13 @@ def parse_time(time_text):
     return None
 
 
+def _clean_service_name(name, noise=_SERVICE_NOISE_RE):
+    """
+    Strip noise words from a service name and collapse the whitespace left over.
+    """
+    return " ".join(noise.sub("", name).split())
+
+
 def generate_ical(collections):
     """
     Generate iCal format from collection data.
@@ -279,8 +536,12 @@ def generate_ical(collections):
         "METHOD:PUBLISH",
     ]
 
-    # Group collections by date
-    collections_by_date = {}
+    # Work out the timestamp and default year once for every event
+    dtstamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    current_year = datetime.now().year
+
+    # Collect regular collections for grouping by date
+    regular_collections = []
     renewal_events = []
 
     for collection in collections:
@@ -288,55 +549,36 @@ def generate_ical(collections):
             service_name, date_text = collection.split(": ", 1)
             service_name = service_name.replace("\n", " ").strip()
 
-            parsed_date = parse_collection_date(date_text)
+            parsed_date = parse_collection_date(date_text, current_year)
             if parsed_date:
-                date_str = parsed_date.strftime("%Y%m%d")
-
                 # Handle renewal events separately
                 if "(renewal)" in service_name.lower():
                     renewal_events.append((service_name, parsed_date, date_text))
                 else:
-                    # Group regular collections by date
-                    if date_str not in collections_by_date:
-                        collections_by_date[date_str] = {
-                            "date": parsed_date,
-                            "services": [],
-                            "has_times": False,
-                        }
-
-                    collections_by_date[date_str]["services"].append(
-                        {
-                            "name": service_name,
-                            "time": (
-                                parsed_date
-                                if parsed_date.hour != 0 or parsed_date.minute != 0
-                                else None
-                            ),
-                            "original_text": date_text,
-                        }
+                    has_time = parsed_date.hour != 0 or parsed_date.minute != 0
+                    regular_collections.append(
+                        (
+                            parsed_date.date(),
+                            {
+                                "name": service_name,
+                                "time": parsed_date if has_time else None,
+                                "original_text": date_text,
+                            },
+                        )
                     )
 
-                    if parsed_date.hour != 0 or parsed_date.minute != 0:
-                        collections_by_date[date_str]["has_times"] = True
-
-    # Create events for grouped collections
-    for date_str, group in collections_by_date.items():
-        services = group["services"]
-        date_obj = group["date"]
-        has_times = group["has_times"]
+    # Sort once so each date's collections are adjacent, keeping the page
+    # order of services within a date, and create an event per date
+    regular_collections.sort(key=itemgetter(0))
+    for collection_date, group in groupby(regular_collections, key=itemgetter(0)):
+        services = [service for _, service in group]
+        date_str = collection_date.strftime("%Y%m%d")
+        has_times = any(service["time"] for service in services)
 
         if len(services) == 1:
             # Single service, use original format
             service = services[0]
-            clean_name = (
-                service["name"].replace("collection", "").replace("waste", "").strip()
-            )
-            clean_name = clean_name.replace(
-                "(blue sacks)", ""
-            ).strip()  # Remove (blue sacks)
-            clean_name = " ".join(
-                clean_name.split()
-            )  # Replace multiple spaces with single space
+            clean_name = _clean_service_name(service["name"])
 
             uid = f"{service['name'].replace(' ', '_')}_{date_str}@brent.gov.uk"
             summary = f"Waste Collection: {clean_name}"
@@ -349,14 +591,7 @@ def generate_ical(collections):
                 dtstart = f"DTSTART;VALUE=DATE:{date_str}"
         else:
             # Multiple services, create consolidated event
-            service_names = []
-            for s in services:
-                name = s["name"].replace("collection", "").replace("waste", "").strip()
-                name = name.replace("(blue sacks)", "").strip()  # Remove (blue sacks)
-                name = " ".join(
-                    name.split()
-                )  # Replace multiple spaces with single space
-                service_names.append(name)
+            service_names = [_clean_service_name(s["name"]) for s in services]
 
             uid = f"collections_{date_str}@brent.gov.uk"
             summary = f"Waste Collections: {', '.join(service_names)}"
@@ -365,19 +600,7 @@ def generate_ical(collections):
                 # Create all-day event with times in description
                 dtstart = f"DTSTART;VALUE=DATE:{date_str}"
                 time_details = []
-                for service in services:
-                    clean_name = (
-                        service["name"]
-                        .replace("collection", "")
-                        .replace("waste", "")
-                        .strip()
-                    )
-                    clean_name = clean_name.replace(
-                        "(blue sacks)", ""
-                    ).strip()  # Remove (blue sacks)
-                    clean_name = " ".join(
-                        clean_name.split()
-                    )  # Replace multiple spaces with single space
+                for service, clean_name in zip(services, service_names):
                     if service["time"]:
                         time_str = service["time"].strftime("%I:%M%p").lower()
                         time_details.append(f"+ {clean_name}: {time_str}")
@@ -397,29 +620,20 @@ def generate_ical(collections):
                 )
 
         # Create event
-        ical_lines.extend(
-            [
-                "BEGIN:VEVENT",
-                f"UID:{uid}",
-                dtstart,
-                f"SUMMARY:{summary}",
-                f"DESCRIPTION:{description}",
-                "CATEGORIES:Waste Collection",
-                f"DTSTAMP:{datetime.now().strftime('%Y%m%dT%H%M%SZ')}",
-                "END:VEVENT",
-            ]
+        ical_lines.append(
+            _VEVENT_TEMPLATE.format(
+                uid=uid,
+                dtstart=dtstart,
+                summary=summary,
+                description=description,
+                dtstamp=dtstamp,
+            )
         )
 
     # Add renewal events separately
     for service_name, parsed_date, date_text in renewal_events:
         date_str = parsed_date.strftime("%Y%m%d")
-        clean_name = service_name.replace("collection", "").strip()
-        clean_name = clean_name.replace(
-            "(blue sacks)", ""
-        ).strip()  # Remove (blue sacks)
-        clean_name = " ".join(
-            clean_name.split()
-        )  # Replace multiple spaces with single space
+        clean_name = _clean_service_name(service_name, _RENEWAL_NOISE_RE)
 
         # Make renewal events more explicit
         if "(renewal)" in clean_name.lower():
@@ -434,53 +648,90 @@ def generate_ical(collections):
             datetime_str = parsed_date.strftime("%Y%m%dT%H%M%S")
             dtstart = f"DTSTART:{datetime_str}"
 
-        ical_lines.extend(
-            [
-                "BEGIN:VEVENT",
-                f"UID:{uid}",
-                dtstart,
-                f"SUMMARY:{clean_name}",
-                f"DESCRIPTION:{clean_name}",
-                "CATEGORIES:Waste Collection",
-                f"DTSTAMP:{datetime.now().strftime('%Y%m%dT%H%M%SZ')}",
-                "END:VEVENT",
-            ]
+        ical_lines.append(
+            _VEVENT_TEMPLATE.format(
+                uid=uid,
+                dtstart=dtstart,
+                summary=clean_name,
+                description=clean_name,
+                dtstamp=dtstamp,
+            )
         )
 
     ical_lines.append("END:VCALENDAR")
     return "\n".join(ical_lines)
 
 
+def _write_collections(collection_data):
+    """
+    Print the numbered collection list with a single write to stdout.
+    """
+    sys.stdout.write(
+        "".join(f"{i:2d}. {item}\n" for i, item in enumerate(collection_data, 1))
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def _parsed_document(filename, mtime):  # pylint: disable=unused-argument
+    """
+    Parse a saved HTML file, reusing the result while the file is unchanged.
+    The mtime argument only forms part of the cache key.
+    """
+    # Let lxml read the file itself rather than building a Python string first
+    parser = lxml.html.HTMLParser(encoding="utf-8")
+    document = lxml.html.parse(filename, parser=parser).getroot()
+    if document is None:
+        # Raised rather than returned, so an empty file is never cached
+        raise etree.ParserError(f"{filename} is empty")
+    return document
+
+
 def test_with_saved_html(filename, output_file=None):
     """
     Test the extraction using a saved HTML file.
     """
     try:
-        with open(filename, "r", encoding="utf-8") as f:
-            content = f.read()
+        document = _parsed_document(filename, os.path.getmtime(filename))
+        collection_data = extract_collection_dates(document)
+    except etree.ParserError:
+        # An empty file has no document to extract from
+        collection_data = None
+    except FileNotFoundError:
+        print(f"File {filename} not found.")
+        return
+    except (IOError, OSError) as e:
+        print(f"Error reading file: {e}")
+        return
 
-        soup = BeautifulSoup(content, "html.parser")
-        collection_data = extract_collection_dates(soup)
+    if collection_data:
+        _report_collection_data(collection_data, output_file)
+    else:
+        print("No collection data found in the saved HTML file.")
 
-        if collection_data:
-            print(f"Found {len(collection_data)} collection dates/info:")
-            print("-" * 50)
-            for i, item in enumerate(collection_data, 1):
-                print(f"{i:2d}. {item}")
 
-            # Generate and save iCal if output file specified
-            if output_file:
-                ical_content = generate_ical(collection_data)
+def _report_collection_data(collection_data, output_file=None):
+    """
+    Print the collection data for a property and save it as iCal if requested.
+    """
+    if collection_data:
+        print(f"\nFound {len(collection_data)} collection dates/info:")
+        print("-" * 50)
+
+        _write_collections(collection_data)
+
+        # Generate and save iCal if output file specified
+        if output_file:
+            ical_content = generate_ical(collection_data)
+            try:
                 with open(output_file, "w", encoding="utf-8") as f:
                     f.write(ical_content)
                 print(f"\nSaved iCal format to: {output_file}")
-        else:
-            print("No collection data found in the saved HTML file.")
-
-    except FileNotFoundError:
-        print(f"File {filename} not found.")
-    except (IOError, OSError) as e:
-        print(f"Error reading file: {e}")
+            except OSError as e:
+                print(f"\nError writing file: {e}")
+    else:
+        print("\nNo collection data found.")
+        print("The property ID may be invalid or the service may be unavailable.")
+        print("Try checking the URL manually in a browser.")
 
 
 def main():
@@ -496,6 +747,8 @@ Examples:
   %(prog)s saved.html         # Test with saved HTML file
   %(prog)s 1234567 -o calendar.ics  # Save calendar to specific file
   %(prog)s 1234567 --cache-html  # Cache HTML files for debugging
+  %(prog)s 1234567 --no-cache    # Ignore cached collection data
+  %(prog)s --property-ids 1234567,7654321 -o calendar.ics  # Several properties at once
   BRENT_PROPERTY_ID=1234567 %(prog)s  # Use environment variable
 """,
     )
@@ -519,8 +772,47 @@ Examples:
         help="Cache HTML files for debugging. If not specified, HTML files are not saved.",
     )
 
+    parser.add_argument(
+        "--property-ids",
+        help="Comma-separated property IDs to look up concurrently. With --output, "
+        "each property's calendar is saved with its ID appended to the file name.",
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Force re-download, ignoring cached collection data",
+    )
+
+    parser.add_argument(
+        "--ttl",
+        type=int,
+        default=_DEFAULT_CACHE_TTL,
+        help=f"Seconds to reuse cached collection data for (default: {_DEFAULT_CACHE_TTL})",
+    )
+
     args = parser.parse_args()
 
+    if args.property_ids:
+        property_ids = [p.strip() for p in args.property_ids.split(",") if p.strip()]
+        print(f"Extracting waste collection dates for properties: {property_ids}")
+        print("=" * 60)
+
+        results = get_many(
+            property_ids,
+            cache_html=args.cache_html,
+            cache_ttl=0 if args.no_cache else args.ttl,
+        )
+
+        for property_id, collection_data in results.items():
+            print(f"\nProperty {property_id}:")
+            output_file = None
+            if args.output:
+                output_path = Path(args.output)
+                output_file = output_path.with_stem(f"{output_path.stem}_{property_id}")
+            _report_collection_data(collection_data, output_file)
+        return
+
     # Get property_id from args or environment variable
     property_id = args.property_id or os.environ.get("BRENT_PROPERTY_ID")
     if not property_id:
@@ -537,25 +829,13 @@ Examples:
     print(f"Extracting waste collection dates for property: {property_id}")
     print("=" * 60)
 
-    collection_data = get_collection_data(property_id, cache_html=args.cache_html)
-
-    if collection_data:
-        print(f"\nFound {len(collection_data)} collection dates/info:")
-        print("-" * 50)
-
-        for i, item in enumerate(collection_data, 1):
-            print(f"{i:2d}. {item}")
+    collection_data = get_collection_data(
+        property_id,
+        cache_html=args.cache_html,
+        cache_ttl=0 if args.no_cache else args.ttl,
+    )
 
-        # Generate and save iCal if output file specified
-        if args.output:
-            ical_content = generate_ical(collection_data)
-            with open(args.output, "w", encoding="utf-8") as f:
-                f.write(ical_content)
-            print(f"\nSaved iCal format to: {args.output}")
-    else:
-        print("\nNo collection data found.")
-        print("The property ID may be invalid or the service may be unavailable.")
-        print("Try checking the URL manually in a browser.")
+    _report_collection_data(collection_data, args.output)
 
 
 if __name__ == "__main__":